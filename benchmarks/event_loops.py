@@ -0,0 +1,186 @@
+"""Сравнение реализаций event loop на коде клиента.
+
+Для каждой реализации из `tools.LOOP_CHOICES` меряются:
+- скорость чтения `MessagesManager.read_msgs`, строк в секунду;
+- задержка отправки через `MessagesManager.send_msgs` и `SendScheduler`:
+  от постановки сообщения в `sending_queue` до его получения сервером;
+- время переподключения `MessagesManager.run` после смены учётных данных:
+  от сообщения в `user_queue` до повторно установленного соединения чтения.
+
+Тестовые серверы работают в отдельном потоке на обычном asyncio, чтобы
+их работа не попадала в замер клиента.
+
+Запуск: python -m benchmarks.event_loops --lines 200000
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import statistics
+import threading
+import time
+
+from bus import EventBus
+from gui import gui
+from msg import MessagesManager
+from tools import LOOP_CHOICES, run_event_loop
+
+LINE = b"Minecrafter: " + b"x" * 64 + b"\n"
+
+
+def start_server(handle) -> int:
+    """Запускает сервер в отдельном потоке и возвращает его порт."""
+    ready = threading.Event()
+    port = None
+
+    async def serve():
+        nonlocal port
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return port
+
+
+def make_manager(read_port: int, write_port: int, **kwargs) -> MessagesManager:
+    return MessagesManager(
+        bus=EventBus(),
+        sending_queue=asyncio.Queue(),
+        status_updates_queue=asyncio.Queue(),
+        user_queue=asyncio.Queue(),
+        read_host="127.0.0.1",
+        read_port=read_port,
+        write_host="127.0.0.1",
+        write_port=write_port,
+        **kwargs,
+    )
+
+
+async def greet_and_drain(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # приветствие без запроса хеша: клиент сразу переходит к отправке
+    writer.write(b"Hello!\n")
+    await writer.drain()
+    while await reader.readline():
+        pass
+    writer.close()
+
+
+async def measure_read(lines: int) -> float:
+    async def flood(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        chunk = LINE * 1000
+        for _ in range(lines // 1000):
+            writer.write(chunk)
+            await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    port = start_server(flood)
+    msg_manager = make_manager(port, port)
+    start = time.perf_counter()
+    await msg_manager.read_msgs()
+    seconds = time.perf_counter() - start
+    return lines // 1000 * 1000 / seconds
+
+
+async def measure_send(messages: int, interval: float) -> list[float]:
+    latencies = []
+    done = threading.Event()
+
+    async def receive(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"Hello!\n")
+        await writer.drain()
+        while data := await reader.readline():
+            # в тексте время постановки в очередь, пустые строки - разделители
+            if text := data.strip():
+                latencies.append(time.perf_counter() - float(text))
+                if len(latencies) == messages:
+                    done.set()
+        writer.close()
+
+    port = start_server(receive)
+    msg_manager = make_manager(port, port)
+    sender = asyncio.create_task(msg_manager.send_msgs())
+    for _ in range(messages):
+        msg_manager.sending_queue.put_nowait(f"{time.perf_counter()}")
+        await asyncio.sleep(interval)
+    await asyncio.to_thread(done.wait, 10)
+    sender.cancel()
+    await asyncio.gather(sender, return_exceptions=True)
+    return latencies
+
+
+async def wait_read_established(status_updates_queue: asyncio.Queue) -> None:
+    while True:
+        status = await status_updates_queue.get()
+        if status == gui.ReadConnectionStateChanged.ESTABLISHED:
+            return
+
+
+async def measure_reconnect(connections: int) -> list[float]:
+    port = start_server(greet_and_drain)
+    msg_manager = make_manager(port, port, reconnect_delay=0)
+    runner = asyncio.create_task(msg_manager.run())
+    await wait_read_established(msg_manager.status_updates_queue)
+
+    timings = []
+    for _ in range(connections):
+        start = time.perf_counter()
+        # новые учётные данные рвут соединения и запускают переподключение
+        msg_manager.user_queue.put_nowait(gui.NicknameReceived("benchmark"))
+        await wait_read_established(msg_manager.status_updates_queue)
+        timings.append(time.perf_counter() - start)
+
+    runner.cancel()
+    await asyncio.gather(runner, return_exceptions=True)
+    return timings
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200_000, help="Строк для чтения")
+    parser.add_argument(
+        "--messages", type=int, default=2000, help="Сообщений для замера отправки"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.001,
+        help="Пауза между отправляемыми сообщениями, с",
+    )
+    parser.add_argument(
+        "--connections", type=int, default=200, help="Число переподключений"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # обрывы соединений при переподключении здесь штатные, в лог их не пишем
+    logging.disable(logging.ERROR)
+    for loop in LOOP_CHOICES:
+        if loop == "uvloop" and importlib.util.find_spec("uvloop") is None:
+            print(f"{loop:>8}: not installed, skipped")
+            continue
+
+        lines_per_second = run_event_loop(measure_read(args.lines), loop=loop)
+        send = run_event_loop(measure_send(args.messages, args.interval), loop=loop)
+        reconnect = run_event_loop(measure_reconnect(args.connections), loop=loop)
+        print(
+            f"{loop:>8}: read {lines_per_second:.0f} lines/s, "
+            f"send p50={percentile(send, 0.5) * 1e6:.0f}us "
+            f"p99={percentile(send, 0.99) * 1e6:.0f}us, "
+            f"reconnect mean={statistics.fmean(reconnect) * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
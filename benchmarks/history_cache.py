@@ -0,0 +1,100 @@
+"""Память и скорость запросов к HistoryCache.
+
+Запуск: python -m benchmarks.history_cache --messages 100000
+"""
+
+import argparse
+import datetime
+import random
+import string
+import time
+import tracemalloc
+
+from history_cache import HistoryCache
+
+# частые слова: запросы с ними проверяют пересечение длинных списков индекса
+COMMON_WORDS = [("the", 0.6), ("and", 0.4), ("chat", 0.1)]
+
+
+def make_messages(count: int, rnd: random.Random) -> list[tuple[str, str]]:
+    authors = ["".join(rnd.choices(string.ascii_letters, k=8)) for _ in range(500)]
+    words = [
+        "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 9)))
+        for _ in range(5000)
+    ]
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        (
+            (start + datetime.timedelta(seconds=i)).strftime("%d-%m-%Y %H:%M"),
+            f"{rnd.choice(authors)}: "
+            + " ".join(
+                rnd.choices(words, k=12)
+                + [word for word, share in COMMON_WORDS if rnd.random() < share]
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def measure_memory(messages: list[tuple[str, str]]) -> tuple[HistoryCache, int]:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cache = HistoryCache(capacity=len(messages))
+    for dt, text in messages:
+        # копия строки, как у сообщения из сокета: её держит только кэш
+        cache.append(dt, text.encode().decode())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return cache, size
+
+
+def timeit(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--messages", type=int, default=100_000, help="Число сообщений в кэше"
+    )
+    parser.add_argument("--repeat", type=int, default=1000, help="Повторов запроса")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rnd = random.Random(0)
+    messages = make_messages(args.messages, rnd)
+    raw = sum(len(text.encode()) for _, text in messages)
+
+    cache, size = measure_memory(messages)
+    print(
+        f"memory: {size / 2**20:.1f}MiB for {len(cache)} messages "
+        f"({size / len(cache):.0f}B/message, raw text {raw / len(cache):.0f}B/message)"
+    )
+
+    sample_dt, sample_text = messages[-args.messages // 2]
+    word1, word2 = sample_text.split(": ", 1)[1].split()[:2]
+    seq = cache.append(*messages[0])
+    queries = {
+        "append+evict": lambda: cache.append(sample_dt, sample_text),
+        "contains": lambda: cache.contains(sample_text),
+        "get": lambda: cache.get(seq),
+        "recent(50)": lambda: cache.recent(50),
+        f"search({word1!r})": lambda: cache.search(word1),
+        f"search({word1!r} {word2!r})": lambda: cache.search(f"{word1} {word2}"),
+        "search('the')": lambda: cache.search("the"),
+        "search('the and')": lambda: cache.search("the and"),
+        f"search('the and {word1}')": lambda: cache.search(f"the and {word1}"),
+        "search('the chat')": lambda: cache.search("the chat"),
+    }
+    for name, query in queries.items():
+        print(f"{name:>30}: {timeit(query, args.repeat):.2f}us")
+
+
+if __name__ == "__main__":
+    main()
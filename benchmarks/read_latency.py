@@ -0,0 +1,156 @@
+"""Задержка чтения сокета при медленной отрисовке GUI.
+
+Локальный сервер в отдельном потоке шлёт строки с отметкой времени отправки,
+`MessagesManager.read_msgs` их читает, а «GUI» на каждом кадре блокирует
+свой loop на `--render_ms`. Сравниваются два режима:
+
+- single: сеть и GUI в одном event loop, как в `main.main` по умолчанию;
+- thread: сеть в `NetworkThread`, как в `main.py --network_thread`.
+
+Запуск: python -m benchmarks.read_latency --messages 500 --render_ms 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from bus import EventBus, MessageReceived
+from channels import ThreadSafeChannel
+from msg import MessagesManager
+from network_thread import NetworkThread
+
+
+def start_server(messages: int, interval: float) -> tuple[threading.Thread, int]:
+    ready = threading.Event()
+    port = None
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        for _ in range(messages):
+            writer.write(f"{time.perf_counter()}\n".encode())
+            await writer.drain()
+            await asyncio.sleep(interval)
+        writer.close()
+        await writer.wait_closed()
+        server.close()
+
+    async def serve():
+        nonlocal port, server
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        ready.set()
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    server = None
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait()
+    return thread, port
+
+
+async def collect_latencies(queue: ThreadSafeChannel, messages: int) -> list[float]:
+    latencies = []
+    while len(latencies) < messages:
+        for event in await queue.get_many():
+            latencies.append(time.perf_counter() - float(event.text))
+    return latencies
+
+
+async def simulate_rendering(
+    messages_queue: ThreadSafeChannel, render_ms: float, done: threading.Event
+) -> None:
+    while not done.is_set():
+        while not messages_queue.empty():
+            messages_queue.get_nowait()
+        # «тяжёлая» перерисовка блокирует весь loop
+        time.sleep(render_ms / 1000)
+        await asyncio.sleep(1 / 120)
+
+
+def make_manager(port: int) -> MessagesManager:
+    return MessagesManager(
+        bus=EventBus(),
+        sending_queue=asyncio.Queue(),
+        status_updates_queue=asyncio.Queue(),
+        user_queue=asyncio.Queue(),
+        read_host="127.0.0.1",
+        read_port=port,
+        write_host="127.0.0.1",
+        write_port=port,
+    )
+
+
+async def run_single(messages: int, interval: float, render_ms: float) -> list:
+    _, port = start_server(messages, interval)
+    msg_manager = make_manager(port)
+    messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=messages)
+    save_messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=messages)
+    done = threading.Event()
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(msg_manager.read_msgs())
+        tg.create_task(simulate_rendering(messages_queue, render_ms, done))
+        latencies = await collect_latencies(save_messages_queue, messages)
+        done.set()
+    return latencies
+
+
+async def run_thread(messages: int, interval: float, render_ms: float) -> list:
+    _, port = start_server(messages, interval)
+    msg_manager = make_manager(port)
+    messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=messages)
+    save_messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=messages)
+    done = threading.Event()
+    latencies = []
+
+    async def network():
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(msg_manager.read_msgs())
+            latencies.extend(await collect_latencies(save_messages_queue, messages))
+        done.set()
+
+    thread = NetworkThread(network)
+    thread.start()
+    await simulate_rendering(messages_queue, render_ms, done)
+    thread.stop()
+    return latencies
+
+
+def report(mode: str, latencies: list[float]) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    print(
+        f"{mode:>6}: n={len(ms)} "
+        f"mean={statistics.fmean(ms):.2f}ms "
+        f"p50={ms[len(ms) // 2]:.2f}ms "
+        f"p99={ms[int(len(ms) * 0.99) - 1]:.2f}ms "
+        f"max={ms[-1]:.2f}ms"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300, help="Число сообщений")
+    parser.add_argument(
+        "--interval", type=float, default=0.005, help="Пауза между сообщениями, с"
+    )
+    parser.add_argument(
+        "--render_ms", type=float, default=50, help="Длительность одного кадра, мс"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    report(
+        "single", asyncio.run(run_single(args.messages, args.interval, args.render_ms))
+    )
+    report(
+        "thread", asyncio.run(run_thread(args.messages, args.interval, args.render_ms))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Прогон записанного трафика через read_msgs -> update_conversation_history -> save_msgs_to_db.
+
+Запись делается через `main.py --record` или `read_from_server --records`,
+воспроизводится встроенным replay-сервером, поэтому результаты повторяемы.
+
+Запуск: python -m benchmarks.replay_pipeline --file chat.rec --speed 0
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from bus import EventBus, MessageReceived
+from db import Storage, save_msgs_to_db
+from msg import MessagesManager
+from recording import read_recording, start_replay_server
+
+
+async def drain(queue) -> None:
+    while not queue.empty():
+        await asyncio.sleep(0)
+
+
+async def consume(queue) -> None:
+    while True:
+        await queue.get_many()
+
+
+async def run_once(path: str, speed: float, render: bool) -> dict:
+    server = await start_replay_server(path, "127.0.0.1", 0, speed)
+    port = server.sockets[0].getsockname()[1]
+
+    if render:
+        import tkinter as tk
+        from tkinter.scrolledtext import ScrolledText
+
+        from gui import gui
+
+        root = tk.Tk()
+        root.withdraw()
+        panel = ScrolledText(root)
+
+    db_dir = tempfile.mkdtemp()
+    storage = Storage(path=os.path.join(db_dir, "bench.db"))
+    storage.start()
+
+    msg_manager = MessagesManager(
+        bus=EventBus(),
+        sending_queue=asyncio.Queue(),
+        status_updates_queue=asyncio.Queue(),
+        user_queue=asyncio.Queue(),
+        read_host="127.0.0.1",
+        read_port=port,
+        write_host="127.0.0.1",
+        write_port=port,
+    )
+
+    # без ограничения буферов, чтобы в замер попали все сообщения
+    messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=0)
+    save_messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=0)
+
+    timings = {}
+    start = time.perf_counter()
+    async with server, asyncio.TaskGroup() as tg:
+        if render:
+            consumer = gui.update_conversation_history(panel, messages_queue)
+        else:
+            consumer = consume(messages_queue)
+        render_task = tg.create_task(consumer)
+        save_task = tg.create_task(save_msgs_to_db(save_messages_queue, storage))
+
+        await msg_manager.read_msgs()
+        timings["read"] = time.perf_counter() - start
+
+        await drain(messages_queue)
+        timings["render"] = time.perf_counter() - start
+        render_task.cancel()
+
+        save_messages_queue.put_nowait(None)
+        await save_task
+    storage.close()
+    timings["persist"] = time.perf_counter() - start
+
+    if render:
+        root.destroy()
+    return timings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", required=True, help="Файл записи трафика")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="Скорость воспроизведения: 1 - как в записи, N - в N раз быстрее, 0 - без пауз",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Число прогонов")
+    parser.add_argument(
+        "--no_render",
+        action="store_true",
+        help="Не рисовать сообщения в Tk (для машин без дисплея)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    lines = sum(data.count(b"\n") for _, data in read_recording(args.file))
+    runs = [
+        asyncio.run(run_once(args.file, args.speed, not args.no_render))
+        for _ in range(args.repeat)
+    ]
+    for phase in ("read", "render", "persist"):
+        seconds = statistics.median(run[phase] for run in runs)
+        print(f"{phase:>8}: {seconds * 1000:.1f}ms ({lines / seconds:.0f} lines/s)")
+
+
+if __name__ == "__main__":
+    main()
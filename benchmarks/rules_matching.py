@@ -0,0 +1,89 @@
+"""Стоимость проверки сообщения правилами в зависимости от их числа.
+
+Отдельно меряются ключевые слова (один автомат Ахо-Корасик, цена почти
+не зависит от числа слов) и регулярки (цена растёт линейно).
+
+Запуск: python -m benchmarks.rules_matching --messages 20000
+"""
+
+import argparse
+import random
+import string
+import time
+
+from rules import RulesEngine
+
+
+def random_word(rnd: random.Random) -> str:
+    return "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 10)))
+
+
+def make_keywords_engine(rules_count: int, rnd: random.Random) -> RulesEngine:
+    engine = RulesEngine()
+    engine.set_mentions(["nickname"])
+    engine.set_rules(
+        {
+            "highlight": {"keywords": [random_word(rnd) for _ in range(rules_count)]},
+            "mute": {
+                "keywords": [random_word(rnd) for _ in range(rules_count)],
+                "users": [random_word(rnd) for _ in range(rules_count // 10)],
+            },
+        }
+    )
+    return engine
+
+
+def make_patterns_engine(rules_count: int, rnd: random.Random) -> RulesEngine:
+    engine = RulesEngine()
+    engine.set_mentions(["nickname"])
+    engine.set_rules(
+        {
+            "highlight": {
+                "patterns": [rf"{random_word(rnd)} #\d+" for _ in range(rules_count)]
+            },
+            "mute": {
+                "patterns": [rf"{random_word(rnd)}\w*!" for _ in range(rules_count)]
+            },
+        }
+    )
+    return engine
+
+
+def measure(engine: RulesEngine, messages: list[str]) -> float:
+    start = time.perf_counter()
+    for text in messages:
+        engine.classify(text)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000, help="Число сообщений")
+    parser.add_argument(
+        "--rules",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 5000],
+        help="Размеры наборов правил",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rnd = random.Random(0)
+    messages = [
+        f"{random_word(rnd)}: " + " ".join(random_word(rnd) for _ in range(12))
+        for _ in range(args.messages)
+    ]
+    for rules_count in args.rules:
+        keywords = measure(make_keywords_engine(rules_count, rnd), messages)
+        patterns = measure(make_patterns_engine(rules_count, rnd), messages)
+        print(
+            f"{rules_count:>6} rules: keywords {keywords:.2f}us/message, "
+            f"patterns {patterns:.2f}us/message"
+        )
+
+
+if __name__ == "__main__":
+    main()
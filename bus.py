@@ -0,0 +1,63 @@
+import collections
+import threading
+
+from channels import ThreadSafeChannel
+
+
+class MessageReceived:
+    def __init__(self, dt: str, text: str, action: str | None = None):
+        self.dt = dt
+        self.text = text
+        self.action = action
+
+    @property
+    def line(self) -> str:
+        return f"[{self.dt}] {self.text}"
+
+
+class HistoryReceived:
+    def __init__(self, lines: list[str]):
+        self.lines = lines
+
+
+class MessageSent:
+    def __init__(self, count: int = 1):
+        self.count = count
+
+
+class EventBus:
+    """Рассылка событий подписчикам.
+
+    Событие публикуется один раз и попадает в буфер каждого, кто подписан
+    на его тип. Буферы ограничены и работают как кольцо, поэтому медленный
+    подписчик теряет старые события, но не тормозит остальных. Подписаться
+    можно из любого потока и в любой момент, отправителя это не касается.
+    """
+
+    def __init__(self):
+        self._subscriptions = collections.defaultdict(list)
+        # подписки меняются под замком, publish читает списки без него
+        self._lock = threading.Lock()
+
+    def subscribe(self, *event_types: type, maxsize: int = 1000) -> ThreadSafeChannel:
+        channel = ThreadSafeChannel(maxsize=maxsize)
+        with self._lock:
+            for event_type in event_types:
+                # копия списка, чтобы publish из другого потока не видел его изменение
+                self._subscriptions[event_type] = [
+                    *self._subscriptions[event_type],
+                    channel,
+                ]
+        return channel
+
+    def unsubscribe(self, channel: ThreadSafeChannel) -> None:
+        with self._lock:
+            for event_type, channels in list(self._subscriptions.items()):
+                if channel in channels:
+                    self._subscriptions[event_type] = [
+                        c for c in channels if c is not channel
+                    ]
+
+    def publish(self, event) -> None:
+        for channel in self._subscriptions.get(type(event), ()):
+            channel.put_nowait(event)
@@ -0,0 +1,84 @@
+import asyncio
+import collections
+import threading
+
+
+class ThreadSafeChannel:
+    """Очередь между потоками с пакетным чтением.
+
+    Писать можно из любого потока, читает один потребитель в своём event loop.
+    Пока потребитель не забрал данные, повторные записи не будят его loop,
+    поэтому пачка сообщений стоит одного `call_soon_threadsafe`.
+    С `maxsize` работает как кольцевой буфер: новые элементы вытесняют
+    самые старые, число вытесненных копится в `dropped`.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque(maxlen=maxsize or None)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+        self._waiter = None
+        self._wakeup_scheduled = False
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def put_nowait(self, item) -> None:
+        with self._lock:
+            if self.maxsize and len(self._items) == self.maxsize:
+                self.dropped += 1
+            self._items.append(item)
+            if self._waiter is None or self._wakeup_scheduled:
+                return
+            self._wakeup_scheduled = True
+            loop = self._loop
+        if threading.get_ident() == self._loop_thread:
+            # тот же поток: будим без записи в self-pipe loop
+            loop.call_soon(self._wakeup)
+            return
+        try:
+            loop.call_soon_threadsafe(self._wakeup)
+        except RuntimeError:
+            # loop потребителя уже закрыт, будить некого
+            pass
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items:
+                raise asyncio.QueueEmpty
+            return self._items.popleft()
+
+    async def get(self):
+        items = await self.get_many(max_items=1)
+        return items[0]
+
+    async def get_many(self, max_items: int | None = None) -> list:
+        while True:
+            with self._lock:
+                if self._items:
+                    count = len(self._items)
+                    if max_items is not None:
+                        count = min(count, max_items)
+                    return [self._items.popleft() for _ in range(count)]
+                self._loop = asyncio.get_running_loop()
+                self._loop_thread = threading.get_ident()
+                waiter = self._waiter = self._loop.create_future()
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+
+    def _wakeup(self) -> None:
+        with self._lock:
+            self._wakeup_scheduled = False
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
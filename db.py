@@ -1,54 +1,188 @@
 import asyncio
 import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from queue import SimpleQueue
+from typing import AsyncIterator
 
-import aiosqlite
+from channels import ThreadSafeChannel
 
 DB_FILE_NAME = "my_database.db"
 
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16 * 1024,
+}
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS main.messages (
+        id INTEGER  PRIMARY KEY,
+        dt TEXT NOT NULL,
+        text TEXT NOT NULL
+    );
+"""
+INSERT_MESSAGE_SQL = "INSERT INTO main.messages (dt, text) VALUES (?, ?)"
+SELECT_HISTORY_PAGE_SQL = (
+    "SELECT id, dt, text FROM main.messages WHERE id < ? ORDER BY id DESC LIMIT ?"
+)
+SELECT_LAST_ID_SQL = "SELECT coalesce(max(id), 0) FROM main.messages"
+
+# попытки записать пачку, прежде чем писатель остановится с ошибкой
+WRITE_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 1
+
+_STOP = object()
+
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: dict) -> None:
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name}={value}")
 
-async def save_msgs_to_db(queue: asyncio.Queue):
-    async with aiosqlite.connect(DB_FILE_NAME) as db:
-        while True:
-            item = await queue.get()
-            if item is None:
-                break
 
-            dt, text = item
-
-            logging.debug(f"{dt=} {text=}")
-            await db.execute(
-                f"""
-                INSERT INTO main.messages (dt, text) VALUES (?, ?)
-            """,
-                (dt, text),
-            )
-            await db.commit()
-
-
-async def put_all_messages_in_queue(queue: asyncio.Queue):
-    async with aiosqlite.connect("my_database.db") as db:
-        cursor = await db.execute("SELECT dt, text  FROM main.messages")
-        rows = await cursor.fetchall()
-        for msg in rows:
-            dt, text = msg
-            line = f"[{dt}] {text}"
-            logging.debug(line)
-            queue.put_nowait(line)
-
-
-async def create_table():
-    async with aiosqlite.connect(DB_FILE_NAME) as db:
-        await db.execute(
-            """
-            CREATE TABLE IF NOT EXISTS main.messages (
-                id INTEGER  PRIMARY KEY,
-                dt TEXT NOT NULL,
-                text TEXT NOT NULL
-            );
-        """
+class Storage:
+    """Хранилище истории сообщений.
+
+    Пишет один поток со своим соединением: сообщения копятся в очереди
+    и уходят в базу пачкой с одним commit. Если пачку не удалось записать
+    за `WRITE_ATTEMPTS` попыток, писатель останавливается, а `save` дальше
+    бросает его ошибку. Чтение истории идёт через небольшой пул read-only
+    соединений.
+    """
+
+    def __init__(
+        self,
+        path: str = DB_FILE_NAME,
+        pragmas: dict | None = None,
+        readers: int = 2,
+    ):
+        self.path = path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.readers = readers
+        self._queue = SimpleQueue()
+        self._readers_pool = SimpleQueue()
+        self._writer = None
+        # последний id на момент запуска: всё новее пришло уже вживую
+        self.history_end_id = 0
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self) -> None:
+        self._writer = threading.Thread(
+            target=self._write_loop, name="db-writer", daemon=True
         )
-        await db.commit()
+        self._writer.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+        reader_pragmas = {
+            name: value
+            for name, value in self.pragmas.items()
+            if name in ("mmap_size", "cache_size")
+        }
+        # as_uri экранирует ?, # и % в пути
+        reader_uri = pathlib.Path(self.path).absolute().as_uri() + "?mode=ro"
+        for _ in range(self.readers):
+            connection = sqlite3.connect(reader_uri, uri=True, check_same_thread=False)
+            apply_pragmas(connection, reader_pragmas)
+            self._readers_pool.put(connection)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        while not self._readers_pool.empty():
+            self._readers_pool.get_nowait().close()
+
+    def save(self, dt: str, text: str) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put((dt, text))
+
+    def _write_loop(self) -> None:
+        try:
+            connection = sqlite3.connect(self.path)
+            apply_pragmas(connection, self.pragmas)
+            connection.execute(CREATE_TABLE_SQL)
+            connection.commit()
+            (self.history_end_id,) = connection.execute(SELECT_LAST_ID_SQL).fetchone()
+        except sqlite3.Error as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if _STOP in batch:
+                stopped = True
+                batch = [item for item in batch if item is not _STOP]
+
+            if batch and not self._write_batch(connection, batch):
+                break
+        connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: list) -> bool:
+        logging.debug(f"{len(batch)=}")
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                connection.executemany(INSERT_MESSAGE_SQL, batch)
+                connection.commit()
+                return True
+            except sqlite3.Error as e:
+                logging.error(
+                    f"Failed to save {len(batch)} messages "
+                    f"(attempt {attempt}/{WRITE_ATTEMPTS}): {e}"
+                )
+                error = e
+                if connection.in_transaction:
+                    connection.rollback()
+                if attempt < WRITE_ATTEMPTS:
+                    time.sleep(WRITE_RETRY_DELAY)
+        logging.critical("DB writer stopped, new messages are not saved")
+        self._error = error
+        return False
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list:
+        connection = self._readers_pool.get()
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            self._readers_pool.put(connection)
+
+    async def query(self, sql: str, parameters: tuple = ()) -> list:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._query, sql, parameters)
+
+
+async def save_msgs_to_db(queue: ThreadSafeChannel, storage: Storage):
+    while True:
+        for event in await queue.get_many():
+            if event is None:
+                return
+
+            logging.debug(f"{event.dt=} {event.text=}")
+            storage.save(event.dt, event.text)
 
 
-# if __name__ == "__main__":
-#     asyncio.run(create_table())
+async def stream_history(
+    storage: Storage, page_size: int = 500
+) -> AsyncIterator[list[str]]:
+    """Отдаёт историю страницами от новых к старым, строки внутри страницы по порядку."""
+    before_id = storage.history_end_id + 1
+    while True:
+        rows = await storage.query(SELECT_HISTORY_PAGE_SQL, (before_id, page_size))
+        if not rows:
+            break
+        before_id = rows[-1][0]
+        lines = [f"[{dt}] {text}" for _, dt, text in reversed(rows)]
+        logging.debug(f"{len(lines)=} {before_id=}")
+        yield lines
@@ -1,11 +1,19 @@
 import asyncio
+import functools
 import logging
 import tkinter as tk
 from asyncio import Queue
 from enum import Enum
+from tkinter import messagebox
 from tkinter.scrolledtext import ScrolledText
 from typing import Callable
 
+from bus import HistoryReceived, MessageReceived
+from channels import ThreadSafeChannel
+from history_cache import HistoryCache
+from rules import HIGHLIGHT, MUTE
+from startup import StartupTimer
+
 
 class TkAppClosed(Exception):
     pass
@@ -39,6 +47,11 @@ class TokenReceived:
         self.token = token
 
 
+class ErrorReceived:
+    def __init__(self, text: str):
+        self.text = text
+
+
 def process_new_message(input_field: tk.Entry, sending_queue: Queue) -> None:
     text = input_field.get()
     sending_queue.put_nowait(text)
@@ -56,18 +69,45 @@ async def update_tk(root_frame: tk.Frame, interval: float = 1 / 120) -> None:
 
 
 async def update_conversation_history(
-    panel: ScrolledText, messages_queue: Queue
+    panel: ScrolledText, messages_queue: ThreadSafeChannel
 ) -> None:
+    dropped = 0
     while True:
-        msg = await messages_queue.get()
+        # всё накопленное за время перерисовки вставляем одним куском
+        msgs = await messages_queue.get_many()
+        if messages_queue.dropped != dropped:
+            logging.warning(
+                f"Chat panel skipped {messages_queue.dropped - dropped} messages"
+            )
+            dropped = messages_queue.dropped
+        history = [msg for msg in msgs if isinstance(msg, HistoryReceived)]
+        lines = [
+            msg
+            for msg in msgs
+            if isinstance(msg, MessageReceived) and msg.action != MUTE
+        ]
 
         panel["state"] = "normal"
-        if panel.index("end-1c") != "1.0":
-            panel.insert("end", "\n")
-
         # logging.debug(f"{panel.yview()[1]=} >= 0.98")
         is_scroll_end = panel.yview()[1] >= 0.98
-        panel.insert("end", msg)
+
+        # история старше живых сообщений и приходит от новых страниц к старым
+        for page in history:
+            text = "\n".join(page.lines)
+            if panel.index("end-1c") != "1.0":
+                text += "\n"
+            panel.insert("1.0", text)
+
+        if lines:
+            # все строки с их тегами уходят в Tk одним вызовом insert
+            chunks = []
+            separator = "\n" if panel.index("end-1c") != "1.0" else ""
+            for msg in lines:
+                tags = "highlight" if msg.action == HIGHLIGHT else ()
+                chunks += [separator + msg.line, tags]
+                separator = "\n"
+            panel.insert("end", *chunks)
+
         if is_scroll_end:
             panel.yview(tk.END)
         panel["state"] = "disabled"
@@ -102,6 +142,9 @@ async def update_status_panel(
             token_input_field.delete(0, tk.END)
             token_input_field.insert(0, msg.token)
 
+        if isinstance(msg, ErrorReceived):
+            messagebox.showinfo("ERROR", msg.text)
+
 
 def create_status_panel(root_frame: tk.Frame) -> tuple:
     status_frame = tk.Frame(root_frame)
@@ -130,8 +173,7 @@ def create_status_panel(root_frame: tk.Frame) -> tuple:
 
 def create_input_frame(
     root_frame: tk.Frame,
-    func: Callable,
-    queue: asyncio.Queue,
+    func: Callable[[tk.Entry], None],
     text_button: str,
     text: str = "",
 ) -> tk.Entry:
@@ -143,10 +185,10 @@ def create_input_frame(
     if text:
         input_field.insert(0, text)
 
-    input_field.bind("<Return>", lambda event: func(input_field, queue))
+    input_field.bind("<Return>", lambda event: func(input_field))
     send_button = tk.Button(frame)
     send_button["text"] = text_button
-    send_button["command"] = lambda: func(input_field, queue)
+    send_button["command"] = lambda: func(input_field)
     send_button.pack(side="left")
     return input_field
 
@@ -161,11 +203,26 @@ def process_new_nickname(input_field: tk.Entry, queue: Queue) -> None:
     queue.put_nowait(NicknameReceived(nickname=text))
 
 
+def process_search(input_field: tk.Entry, history_cache: HistoryCache) -> None:
+    query = input_field.get()
+    results = history_cache.search(query)
+
+    window = tk.Toplevel()
+    window.title(f"Поиск: {query}")
+    panel = ScrolledText(window, wrap="none")
+    panel.pack(fill="both", expand=True)
+    lines = [f"[{dt}] {text}" for dt, text in results]
+    panel.insert("end", "\n".join(lines) or "Ничего не найдено")
+    panel["state"] = "disabled"
+
+
 async def draw(
-    messages_queue: Queue,
+    messages_queue: ThreadSafeChannel,
     sending_queue: Queue,
     status_updates_queue: Queue,
     user_queue: Queue,
+    startup: StartupTimer | None = None,
+    history_cache: HistoryCache | None = None,
 ) -> None:
     root = tk.Tk()
 
@@ -178,8 +235,7 @@ async def draw(
     token_input_field = create_input_frame(
         root_frame=root_frame,
         text_button="Сохранить токен",
-        func=process_new_token,
-        queue=user_queue,
+        func=functools.partial(process_new_token, queue=user_queue),
         text="test",
     )
 
@@ -187,8 +243,7 @@ async def draw(
     nickname_input_field = create_input_frame(
         root_frame=root_frame,
         text_button="Сохранить никнейм",
-        func=process_new_nickname,
-        queue=user_queue,
+        func=functools.partial(process_new_nickname, queue=user_queue),
         text="test",
     )
 
@@ -196,17 +251,29 @@ async def draw(
 
     status_labels = create_status_panel(root_frame)
 
+    # Search
+    if history_cache is not None:
+        create_input_frame(
+            root_frame=root_frame,
+            text_button="Найти",
+            func=functools.partial(process_search, history_cache=history_cache),
+        )
+
     # Input
     create_input_frame(
         root_frame=root_frame,
         text_button="Отправить",
-        func=process_new_message,
-        queue=sending_queue,
+        func=functools.partial(process_new_message, sending_queue=sending_queue),
     )
 
     # Scroll
     conversation_panel = ScrolledText(root_frame, wrap="none")
     conversation_panel.pack(side="top", fill="both", expand=True)
+    conversation_panel.tag_config("highlight", background="#fff3a0")
+
+    root.update()
+    if startup is not None:
+        startup.mark("window_shown")
 
     async with asyncio.TaskGroup() as tg:
         tg.create_task(update_tk(root_frame))
@@ -0,0 +1,209 @@
+"""Кэш последних сообщений в памяти.
+
+Сообщения хранятся по колонкам в кольце фиксированного размера: дата и
+автор как номера в таблицах интернированных строк, текст без автора как
+строка. Номер сообщения растёт монотонно, позиция в кольце - номер по
+модулю размера. Для поиска есть инвертированный индекс слово -> номера
+сообщений по возрастанию, поэтому при вытеснении самое старое сообщение
+всегда стоит первым в списках своих слов и удаляется сдвигом начала списка,
+а проверка «есть ли слово в сообщении» - двоичный поиск без копирования.
+"""
+
+import array
+import bisect
+import collections
+import re
+import threading
+
+from channels import ThreadSafeChannel
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> set[str]:
+    return set(WORD_RE.findall(text.lower()))
+
+
+class Interner:
+    """Таблица строк со счётчиком ссылок.
+
+    Номер строки освобождается, когда из кэша вытеснено последнее сообщение
+    с ней, и потом переиспользуется, так что таблица не растёт бесконечно.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+        self._refs = []
+        self._free = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intern(self, value: str) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            if self._free:
+                value_id = self._free.pop()
+                self.values[value_id] = value
+            else:
+                value_id = len(self.values)
+                self.values.append(value)
+                self._refs.append(0)
+            self.ids[value] = value_id
+        self._refs[value_id] += 1
+        return value_id
+
+    def release(self, value_id: int) -> None:
+        self._refs[value_id] -= 1
+        if not self._refs[value_id]:
+            del self.ids[self.values[value_id]]
+            self.values[value_id] = None
+            self._free.append(value_id)
+
+
+class Postings:
+    """Номера сообщений со словом по возрастанию.
+
+    Вытесненные номера не удаляются сразу, а отрезаются от начала списка,
+    когда их набирается половина.
+    """
+
+    __slots__ = ("seqs", "start")
+
+    def __init__(self):
+        self.seqs = []
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def __contains__(self, seq: int) -> bool:
+        i = bisect.bisect_left(self.seqs, seq, self.start)
+        return i < len(self.seqs) and self.seqs[i] == seq
+
+    def append(self, seq: int) -> None:
+        self.seqs.append(seq)
+
+    def popleft(self) -> None:
+        self.start += 1
+        if self.start * 2 >= len(self.seqs):
+            del self.seqs[: self.start]
+            self.start = 0
+
+    def newest_first(self):
+        seqs = self.seqs
+        return (seqs[i] for i in range(len(seqs) - 1, self.start - 1, -1))
+
+
+class HistoryCache:
+    def __init__(self, capacity: int = 100_000):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.capacity = capacity
+        self._dates = Interner()
+        self._authors = Interner()
+        self._date_ids = array.array("I", bytes(4 * capacity))
+        self._author_ids = array.array("I", bytes(4 * capacity))
+        self._bodies = [None] * capacity
+        self._index = collections.defaultdict(Postings)
+        # hash текста -> номер последнего сообщения с таким hash, для дедупликации.
+        # Сам текст не храним второй раз: совпадение сверяется с кольцом, а при
+        # коллизии старое сообщение просто перестаёт считаться виденным
+        self._last_seen = {}
+        self._first = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._next - self._first
+
+    def append(self, dt: str, text: str) -> int:
+        author, separator, body = text.partition(": ")
+        # без автора (в том числе ": текст") храним строку целиком, чтобы _text
+        # восстанавливал её без изменений
+        if not separator or not author:
+            author, body = "", text
+
+        with self._lock:
+            if len(self) == self.capacity:
+                self._evict()
+            seq = self._next
+            position = seq % self.capacity
+            self._date_ids[position] = self._dates.intern(dt)
+            self._author_ids[position] = self._authors.intern(author)
+            self._bodies[position] = body
+            for word in tokenize(text):
+                self._index[word].append(seq)
+            self._last_seen[hash(text)] = seq
+            self._next += 1
+        return seq
+
+    def _evict(self) -> None:
+        seq = self._first
+        text = self._text(seq)
+        for word in tokenize(text):
+            seqs = self._index[word]
+            seqs.popleft()
+            if not seqs:
+                del self._index[word]
+        text_hash = hash(text)
+        if self._last_seen.get(text_hash) == seq:
+            del self._last_seen[text_hash]
+        position = seq % self.capacity
+        self._dates.release(self._date_ids[position])
+        self._authors.release(self._author_ids[position])
+        self._bodies[position] = None
+        self._first += 1
+
+    def _text(self, seq: int) -> str:
+        position = seq % self.capacity
+        author = self._authors.values[self._author_ids[position]]
+        body = self._bodies[position]
+        return f"{author}: {body}" if author else body
+
+    def _record(self, seq: int) -> tuple[str, str]:
+        position = seq % self.capacity
+        return self._dates.values[self._date_ids[position]], self._text(seq)
+
+    def get(self, seq: int) -> tuple[str, str] | None:
+        with self._lock:
+            if not self._first <= seq < self._next:
+                return None
+            return self._record(seq)
+
+    def recent(self, count: int, before: int | None = None) -> list[tuple[str, str]]:
+        """Страница для прокрутки: до count сообщений старше before, по порядку."""
+        with self._lock:
+            end = self._next if before is None else min(before, self._next)
+            start = max(self._first, end - count)
+            return [self._record(seq) for seq in range(start, end)]
+
+    def contains(self, text: str) -> bool:
+        with self._lock:
+            seq = self._last_seen.get(hash(text))
+            return seq is not None and self._text(seq) == text
+
+    def search(self, query: str, limit: int = 50) -> list[tuple[str, str]]:
+        """Сообщения со всеми словами запроса, от новых к старым."""
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            postings = [self._index.get(word) for word in words]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            rarest, others = postings[0], postings[1:]
+            results = []
+            for seq in rarest.newest_first():
+                if all(seq in seqs for seqs in others):
+                    results.append(self._record(seq))
+                    if len(results) == limit:
+                        break
+            return results
+
+    async def consume(self, queue: ThreadSafeChannel) -> None:
+        while True:
+            for event in await queue.get_many():
+                self.append(event.dt, event.text)
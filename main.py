@@ -1,16 +1,32 @@
 import argparse
 import asyncio
+import logging
 from logging import config as logging_config
 from tkinter import TclError
 
-from db import create_table, put_all_messages_in_queue, save_msgs_to_db
+from bus import EventBus, HistoryReceived, MessageReceived
+from channels import ThreadSafeChannel
+from db import DB_FILE_NAME, Storage, save_msgs_to_db, stream_history
 from gui import gui
+from history_cache import HistoryCache
 from logging_config import LOGGING
 from msg import MessagesManager
+from network_thread import NetworkThread
+from recording import Recorder
+from rules import RulesEngine
+from startup import StartupTimer
+from tools import LOOP_CHOICES, run_event_loop
 
 logging_config.dictConfig(LOGGING)
 
 
+def parse_pragma(value: str) -> tuple[str, str]:
+    name, separator, pragma_value = value.partition("=")
+    if not separator or not name or not pragma_value:
+        raise argparse.ArgumentTypeError(f"ожидается NAME=VALUE, получено {value!r}")
+    return name, pragma_value
+
+
 def parse_args() -> dict:
     parser = argparse.ArgumentParser()
 
@@ -37,53 +53,172 @@ def parse_args() -> dict:
         type=int,
         help="Порт для отправки сообщений",
     )
+    parser.add_argument(
+        "--network_thread",
+        action="store_true",
+        help="Запускать сеть и запись в БД в отдельном потоке",
+    )
+    parser.add_argument(
+        "--loop",
+        choices=LOOP_CHOICES,
+        default="asyncio",
+        help="Реализация event loop (без установленного uvloop используется asyncio)",
+    )
+    parser.add_argument(
+        "--db_path",
+        default=DB_FILE_NAME,
+        help="Путь к файлу базы данных",
+    )
+    parser.add_argument(
+        "--db_pragmas",
+        nargs="*",
+        default=[],
+        type=parse_pragma,
+        metavar="NAME=VALUE",
+        help="PRAGMA для sqlite, например journal_mode=WAL cache_size=-16384",
+    )
+    parser.add_argument(
+        "--send_rate",
+        type=float,
+        default=10,
+        help="Не больше стольких сообщений в секунду (0 - без ограничения)",
+    )
+    parser.add_argument(
+        "--send_burst",
+        type=int,
+        default=20,
+        help="Сколько сообщений можно отправить подряд без ожидания",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=100_000,
+        help="Сколько последних сообщений держать в памяти для поиска и дедупликации "
+        "(0 - не держать)",
+    )
+    parser.add_argument(
+        "--rules",
+        help="JSON-файл с правилами подсветки и скрытия сообщений",
+    )
+    parser.add_argument(
+        "--record",
+        help="Файл для записи трафика сервера чтения",
+    )
 
     args = parser.parse_args()
+    if args.send_burst < 1:
+        parser.error("--send_burst должен быть не меньше 1")
+    if args.cache_size < 0:
+        parser.error("--cache_size не может быть отрицательным")
 
     return {
         "read_host": args.read_host,
         "read_port": args.read_port,
         "write_host": args.write_host,
         "write_port": args.write_port,
+        "network_thread": args.network_thread,
+        "loop": args.loop,
+        "db_path": args.db_path,
+        "db_pragmas": dict(args.db_pragmas),
+        "record": args.record,
+        "rules": args.rules,
+        "cache_size": args.cache_size,
+        "send_rate": args.send_rate,
+        "send_burst": args.send_burst,
     }
 
 
-async def main():
-    messages_queue = asyncio.Queue()
-    save_messages_queue = asyncio.Queue()
-    sending_queue = asyncio.Queue()
-    status_updates_queue = asyncio.Queue()
-    watchdog_queue = asyncio.Queue()
-    user_queue = asyncio.Queue()
+async def load_history(storage: Storage, bus: EventBus, startup: StartupTimer) -> None:
+    await asyncio.to_thread(storage.start)
+    startup.mark("db_ready")
+    async for lines in stream_history(storage):
+        bus.publish(HistoryReceived(lines))
+    startup.mark("history_loaded")
+
+
+async def run_network(msg_manager: MessagesManager, storage: Storage) -> None:
+    # БД не должна терять сообщения, поэтому буфер без ограничения
+    save_messages_queue = msg_manager.bus.subscribe(MessageReceived, maxsize=0)
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(msg_manager.run())
+        if msg_manager.history_cache is not None:
+            cache_queue = msg_manager.bus.subscribe(MessageReceived)
+            tg.create_task(msg_manager.history_cache.consume(cache_queue))
+        tg.create_task(msg_manager.rules.watch())
+        tg.create_task(load_history(storage, msg_manager.bus, msg_manager.startup))
+        tg.create_task(save_msgs_to_db(queue=save_messages_queue, storage=storage))
+
 
+async def main(args: dict):
+    startup = StartupTimer()
+    network_thread = args.pop("network_thread")
+    loop = args.pop("loop")
+    storage = Storage(path=args.pop("db_path"), pragmas=args.pop("db_pragmas"))
+    record = args.pop("record")
+    recorder = Recorder(record) if record else None
+    rules = RulesEngine(args.pop("rules"))
+    cache_size = args.pop("cache_size")
+    history_cache = HistoryCache(capacity=cache_size) if cache_size else None
+
+    if network_thread:
+        # очереди между потоками GUI и сети
+        queue_factory = ThreadSafeChannel
+    else:
+        queue_factory = asyncio.Queue
     msg_manager = MessagesManager(
-        messages_queue=messages_queue,
-        save_messages_queue=save_messages_queue,
-        sending_queue=sending_queue,
-        status_updates_queue=status_updates_queue,
-        watchdog_queue=watchdog_queue,
-        user_queue=user_queue,
-        **parse_args(),
+        bus=EventBus(),
+        sending_queue=queue_factory(),
+        status_updates_queue=queue_factory(),
+        user_queue=queue_factory(),
+        recorder=recorder,
+        startup=startup,
+        rules=rules,
+        history_cache=history_cache,
+        **args,
     )
 
-    await create_table()
-    await put_all_messages_in_queue(queue=messages_queue)
+    try:
+        await run_gui_and_network(msg_manager, storage, network_thread, loop)
+    finally:
+        logging.info(f"Startup: {startup.summary()}")
+        storage.close()
+        if recorder is not None:
+            recorder.close()
+
+
+async def run_gui_and_network(
+    msg_manager: MessagesManager, storage: Storage, network_thread: bool, loop: str
+) -> None:
+    messages_queue = msg_manager.bus.subscribe(
+        MessageReceived, HistoryReceived, maxsize=10_000
+    )
+    draw = gui.draw(
+        messages_queue=messages_queue,
+        sending_queue=msg_manager.sending_queue,
+        status_updates_queue=msg_manager.status_updates_queue,
+        user_queue=msg_manager.user_queue,
+        startup=msg_manager.startup,
+        history_cache=msg_manager.history_cache,
+    )
+    if network_thread:
+        thread = NetworkThread(lambda: run_network(msg_manager, storage), loop=loop)
+        thread.start()
+        try:
+            await draw
+        except (KeyboardInterrupt, gui.TkAppClosed, TclError, ExceptionGroup):
+            pass
+        finally:
+            thread.stop(timeout=5)
+        return
 
     try:
         async with asyncio.TaskGroup() as tg:
-            tg.create_task(
-                gui.draw(
-                    messages_queue=messages_queue,
-                    sending_queue=sending_queue,
-                    status_updates_queue=status_updates_queue,
-                    user_queue=user_queue,
-                )
-            )
-            tg.create_task(save_msgs_to_db(queue=save_messages_queue))
-            tg.create_task(msg_manager.run())
+            tg.create_task(draw)
+            tg.create_task(run_network(msg_manager, storage))
     except (KeyboardInterrupt, gui.TkAppClosed, TclError, ExceptionGroup):
         pass
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    run_event_loop(main(args), loop=args["loop"])
@@ -2,42 +2,65 @@ import asyncio
 import datetime
 import json
 import logging
-import sys
-from tkinter import messagebox
 
 from async_timeout import timeout
 
+from bus import EventBus, MessageReceived, MessageSent
 from gui import gui
 from gui.gui import NicknameReceived, TokenReceived
+from history_cache import HistoryCache
+from recording import Recorder
+from rules import RulesEngine
+from send_scheduler import Priority, SendScheduler
+from startup import StartupTimer
 from tools import open_connection, read_line
 
+# пустое сообщение сервер принимает как keepalive
+KEEPALIVE_MESSAGE = ""
+
 
 class MessagesManager:
     def __init__(
         self,
-        messages_queue: asyncio.Queue,
-        save_messages_queue: asyncio.Queue,
+        bus: EventBus,
         sending_queue: asyncio.Queue,
         status_updates_queue: asyncio.Queue,
-        watchdog_queue: asyncio.Queue,
         user_queue: asyncio.Queue,
         read_host: str,
         read_port: int,
         write_host: str,
         write_port: int,
+        recorder: Recorder | None = None,
+        startup: StartupTimer | None = None,
+        send_rate: float = 0,
+        send_burst: int = 1,
+        rules: RulesEngine | None = None,
+        history_cache: HistoryCache | None = None,
+        reconnect_delay: float = 5,
     ):
-        self.messages_queue = messages_queue
-        self.save_messages_queue = save_messages_queue
+        self.bus = bus
         self.sending_queue = sending_queue
         self.status_updates_queue = status_updates_queue
-        self.watchdog_queue = watchdog_queue
+        self.watchdog_events = bus.subscribe(MessageReceived, MessageSent, maxsize=16)
         self.user_queue = user_queue
         self.read_host = read_host
         self.read_port = read_port
         self.write_host = write_host
         self.write_port = write_port
+        self.recorder = recorder
+        self.startup = startup
+        # очередь отправки переживает переподключения, неотправленное не теряется
+        self.scheduler = SendScheduler(
+            rate=send_rate,
+            burst=send_burst,
+            on_sent=lambda count: bus.publish(MessageSent(count)),
+        )
+        self.rules = rules
+        self.history_cache = history_cache
+        self.reconnect_delay = reconnect_delay
         self.token = None
         self.nickname = None
+        self.credentials_received = asyncio.Event()
 
     @staticmethod
     async def submit_message(
@@ -48,8 +71,11 @@ class MessagesManager:
         writer.write(f"{text}\n".encode())
         await writer.drain()
 
+    def mark_startup(self, phase: str) -> None:
+        if self.startup is not None:
+            self.startup.mark(phase)
+
     async def run(self):
-        delay = 5
         while True:
             try:
                 async with asyncio.TaskGroup() as tg:
@@ -66,7 +92,7 @@ class MessagesManager:
                 self.status_updates_queue.put_nowait(
                     gui.SendingConnectionStateChanged.INITIATED
                 )
-                await asyncio.sleep(delay)
+                await asyncio.sleep(self.reconnect_delay)
 
     async def read_msgs(self):
         async with open_connection(host=self.read_host, port=self.read_port) as (
@@ -76,29 +102,43 @@ class MessagesManager:
             self.status_updates_queue.put_nowait(
                 gui.ReadConnectionStateChanged.ESTABLISHED
             )
-            data = await read_line(reader=reader)
+            self.mark_startup("read_connected")
+            # после переподключения пропускаем уже виденные строки до первой новой
+            catching_up = self.history_cache is not None and len(self.history_cache)
+            data = await self.read_and_record(reader=reader)
             while data:
-                self.watchdog_queue.put_nowait("New message in chat")
+                if catching_up and self.history_cache.contains(data):
+                    logging.debug(f"Skip duplicate after reconnect: {data}")
+                    data = await self.read_and_record(reader=reader)
+                    continue
+                catching_up = False
+                self.mark_startup("first_live_message")
                 dt = datetime.datetime.now().strftime("%d-%m-%Y %H:%M")
-                line = f"[{dt}] {data}"
-                logging.debug(line)
-                self.messages_queue.put_nowait(line)
-                self.save_messages_queue.put_nowait((dt, data))
-                data = await read_line(reader=reader)
+                logging.debug(f"[{dt}] {data}")
+                action = self.rules.classify(data) if self.rules is not None else None
+                self.bus.publish(MessageReceived(dt, data, action))
+                data = await self.read_and_record(reader=reader)
+
+    async def read_and_record(self, reader: asyncio.StreamReader) -> str:
+        if self.recorder is None:
+            return await read_line(reader=reader)
+        data = await reader.readline()
+        self.recorder.write(data)
+        return data.decode().strip()
 
     async def send_msgs(self):
         async with open_connection(host=self.write_host, port=self.write_port) as (
             reader,
             writer,
         ):
+            self.mark_startup("write_connected")
             line: str = await read_line(reader=reader)
             logging.debug(f"{line=}")
             if (
                 "Enter your personal hash"
                 in line  # "Hello %username%! Enter your personal hash or leave it empty to create new account."
             ):
-                while self.token is None and self.nickname is None:
-                    await asyncio.sleep(3)
+                await self.credentials_received.wait()
 
                 if self.token:
                     data = await self.authorise(
@@ -111,6 +151,9 @@ class MessagesManager:
                         reader=reader,
                     )
                 logging.debug(f"{data=}")
+                self.mark_startup("authorised")
+                if self.rules is not None:
+                    self.rules.set_mentions([data["nickname"]])
                 self.status_updates_queue.put_nowait(
                     gui.SendingConnectionStateChanged.ESTABLISHED
                 )
@@ -120,18 +163,24 @@ class MessagesManager:
                 self.status_updates_queue.put_nowait(
                     gui.TokenReceived(data["account_hash"])
                 )
-            while True:
-                text = await self.sending_queue.get()
-                await self.submit_message(writer, f"{text}\n")
-                self.watchdog_queue.put_nowait("Message sent")
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self.scheduler.run(writer))
+                while True:
+                    text = await self.sending_queue.get()
+                    logging.debug(f"{text=}")
+                    if text == KEEPALIVE_MESSAGE:
+                        priority = Priority.HIGH
+                    else:
+                        priority = Priority.NORMAL
+                    self.scheduler.put(f"{text}\n\n", priority)
 
     async def watch_for_connection(self):
         timeout_seconds = 3
         while True:
             try:
                 async with timeout(timeout_seconds):
-                    msg = await self.watchdog_queue.get()
-                    logging.info(f"Connection is alive. {msg}")
+                    event = await self.watchdog_events.get()
+                    logging.info(f"Connection is alive. {type(event).__name__}")
             except TimeoutError:
                 logging.warning(f"{timeout_seconds}s timeout is elapsed")
                 raise ConnectionError
@@ -139,7 +188,7 @@ class MessagesManager:
     async def ping_pong(self):
         timeout_seconds = 3
         while True:
-            self.sending_queue.put_nowait("")
+            self.sending_queue.put_nowait(KEEPALIVE_MESSAGE)
             await asyncio.sleep(timeout_seconds)
 
     async def checking_user_credentials_changes(self):
@@ -151,6 +200,7 @@ class MessagesManager:
             if isinstance(msg, TokenReceived):
                 self.token = msg.token
 
+            self.credentials_received.set()
             raise ConnectionError
 
     async def process_message(
@@ -165,10 +215,11 @@ class MessagesManager:
             data = json.loads(await reader.readline())
         except json.JSONDecodeError:
             logging.error("Received malformed data during processing.")
-            sys.exit(1)
+            raise ValueError("Received malformed data during processing.")
         logging.debug(f"{data=}")
         if data is None:
-            messagebox.showinfo("ERROR", error_message)
+            # окно живёт в другом потоке с --network_thread, Tk отсюда не трогаем
+            self.status_updates_queue.put_nowait(gui.ErrorReceived(error_message))
             logging.error(f"Failed to process: {error_message}")
             raise ValueError(error_message)
         return data
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable
+
+from tools import run_event_loop
+
+
+class NetworkThread(threading.Thread):
+    """Фоновый поток со своим event loop для сетевых задач и записи в БД.
+
+    Tk обязан жить в главном потоке, поэтому медленная перерисовка окна
+    не должна задерживать чтение сокета и watchdog.
+    """
+
+    def __init__(self, main: Callable[[], Awaitable], loop: str = "asyncio"):
+        super().__init__(name="network", daemon=True)
+        self._main = main
+        self._loop_name = loop
+        self._loop = None
+        self._task = None
+        self._started = threading.Event()
+
+    def run(self) -> None:
+        run_event_loop(self._run(), loop=self._loop_name)
+
+    async def _run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._started.set()
+        try:
+            await self._main()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logging.exception("Network thread crashed")
+
+    def stop(self, timeout: float | None = None) -> None:
+        if not self.is_alive():
+            return
+        self._started.wait()
+        try:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:
+            # loop уже закрыт
+            pass
+        self.join(timeout)
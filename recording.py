@@ -0,0 +1,120 @@
+"""Запись и воспроизведение трафика сервера чтения.
+
+Файл записи: заголовок `MAGIC`, затем записи `<QI` (микросекунды от начала
+записи, длина) и сырые байты, прочитанные из сокета.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from typing import Iterator
+
+MAGIC = b"CHATREC1"
+RECORD_HEADER = struct.Struct("<QI")
+
+
+class Recorder:
+    """Пишет сырые данные сокета в файл записи.
+
+    С `append=True` дописывает существующую запись: отметки времени
+    продолжаются с последней записи, а оборванная на середине запись
+    в конце файла отрезается.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        last_offset = 0
+        if append and os.path.exists(path) and os.path.getsize(path):
+            last_offset, end = scan_recording(path)
+            self._file = open(path, "r+b")
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+        self._start = time.monotonic() - last_offset / 1_000_000
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        offset = int((time.monotonic() - self._start) * 1_000_000)
+        self._file.write(RECORD_HEADER.pack(offset, len(data)))
+        self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "Recorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def scan_recording(path: str) -> tuple[int, int]:
+    """Отметка времени последней целой записи и позиция конца этой записи."""
+    size = os.path.getsize(path)
+    last_offset = 0
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a chat recording")
+        end = f.tell()
+        while header := f.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                break
+            offset, length = RECORD_HEADER.unpack(header)
+            if f.tell() + length > size:
+                break
+            end = f.seek(length, os.SEEK_CUR)
+            last_offset = offset
+    return last_offset, end
+
+
+def read_recording(path: str) -> Iterator[tuple[float, bytes]]:
+    """Записи файла по порядку. Оборванная запись в конце файла пропускается."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a chat recording")
+        while header := f.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                break
+            offset, size = RECORD_HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                break
+            yield offset / 1_000_000, data
+
+
+async def replay(
+    records: list[tuple[float, bytes]],
+    writer: asyncio.StreamWriter,
+    speed: float = 1,
+) -> None:
+    """Отдаёт записи в сокет. speed=0 - без пауз, максимально быстро."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for offset, data in records:
+        if speed:
+            delay = start + offset / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        writer.write(data)
+        await writer.drain()
+
+
+async def start_replay_server(
+    path: str, host: str, port: int, speed: float = 1
+) -> asyncio.Server:
+    records = list(read_recording(path))
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        logging.debug(f"Replay {path} to {writer.get_extra_info('peername')}")
+        try:
+            await replay(records, writer, speed)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,223 @@
+"""Правила подсветки и скрытия входящих сообщений.
+
+Файл правил в JSON:
+
+    {
+        "highlight": {"keywords": ["python"], "patterns": ["bug #\\\\d+"]},
+        "mute": {"users": ["spammer"], "keywords": ["casino"], "patterns": []}
+    }
+
+Файл с неверной структурой не загружается, остаются прежние правила.
+Все ключевые слова обеих секций собираются в один автомат Ахо-Корасик,
+поэтому их проверка стоит один проход по тексту независимо от числа слов.
+Авторы ищутся в множестве. Регулярки каждой секции объединяются в одно
+выражение, но движок `re` всё равно пробует альтернативы по очереди, так что
+их стоимость растёт линейно с числом выражений: для больших списков слов
+используйте `keywords`, а не `patterns`.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import os
+import re
+
+HIGHLIGHT = "highlight"
+MUTE = "mute"
+
+# при совпадении нескольких правил побеждает скрытие
+_PRIORITY = {None: 0, HIGHLIGHT: 1, MUTE: 2}
+
+
+class AhoCorasick:
+    def __init__(self, words: dict[str, str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]
+        for word, action in words.items():
+            node = 0
+            for char in word:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node] = max(self._output[node], action, key=_PRIORITY.get)
+
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = max(
+                    self._output[child],
+                    self._output[self._fail[child]],
+                    key=_PRIORITY.get,
+                )
+                queue.append(child)
+
+    def search(self, text: str) -> str | None:
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        action = None
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] == MUTE:
+                return MUTE
+            if output[node]:
+                action = output[node]
+        return action
+
+
+# допустимые списки в каждой секции файла правил
+SECTION_KEYS = {
+    HIGHLIGHT: ("keywords", "patterns"),
+    MUTE: ("users", "keywords", "patterns"),
+}
+
+
+def check_rules(rules) -> None:
+    """Проверяет форму правил: словарь секций, в секциях списки строк."""
+    if not isinstance(rules, dict):
+        raise ValueError(f"rules must be an object, got {type(rules).__name__}")
+    for action, section in rules.items():
+        if action not in SECTION_KEYS:
+            raise ValueError(f"Unknown rules section {action!r}")
+        if not isinstance(section, dict):
+            raise ValueError(f"Section {action!r} must be an object")
+        for key, values in section.items():
+            if key not in SECTION_KEYS[action]:
+                raise ValueError(f"Unknown key {key!r} in section {action!r}")
+            if not isinstance(values, list) or not all(
+                isinstance(value, str) for value in values
+            ):
+                raise ValueError(f"{action}.{key} must be a list of strings")
+
+
+class CompiledRules:
+    def __init__(self, rules: dict, mentions: list[str]):
+        check_rules(rules)
+        keywords = {}
+        for action in (HIGHLIGHT, MUTE):
+            for keyword in rules.get(action, {}).get("keywords", []):
+                if keyword:
+                    keywords[keyword.lower()] = max(
+                        keywords.get(keyword.lower()), action, key=_PRIORITY.get
+                    )
+        self.keywords = AhoCorasick(keywords) if keywords else None
+        # свой ник ищем только в тексте после автора, иначе подсветятся свои
+        # сообщения; ников один-два, поэтому хватает поиска подстроки
+        self.mentions = tuple(mention.lower() for mention in mentions if mention)
+
+        self.muted_users = {
+            user.lower() for user in rules.get(MUTE, {}).get("users", []) if user
+        }
+
+        self.mute_patterns = compile_patterns(MUTE, rules)
+        self.highlight_patterns = compile_patterns(HIGHLIGHT, rules)
+
+    def classify(self, text: str) -> str | None:
+        author, separator, body = text.partition(":")
+        if separator and author.lower() in self.muted_users:
+            return MUTE
+        if not separator:
+            body = text
+
+        action = None
+        if self.keywords is not None:
+            action = self.keywords.search(text.lower())
+            if action == MUTE:
+                return MUTE
+
+        if any(pattern.search(text) for pattern in self.mute_patterns):
+            return MUTE
+        if action is None and any(
+            pattern.search(text) for pattern in self.highlight_patterns
+        ):
+            action = HIGHLIGHT
+        if action is None and self.mentions:
+            body = body.lower()
+            if any(mention in body for mention in self.mentions):
+                action = HIGHLIGHT
+        return action
+
+
+def compile_patterns(action: str, rules: dict) -> list[re.Pattern]:
+    """Регулярки секции: без групп - одним выражением, с группами - по одной.
+
+    При склейке через `|` группы перенумеровываются, и обратные ссылки
+    вроде `(a)\\1` начинают указывать не туда, поэтому такие выражения
+    проверяются отдельно.
+    """
+    merged, separate = [], []
+    for pattern in rules.get(action, {}).get("patterns", []):
+        try:
+            compiled = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Bad {action} pattern {pattern!r}: {e}") from e
+        if compiled.groups:
+            separate.append(compiled)
+        else:
+            merged.append(compiled)
+    if len(merged) > 1:
+        try:
+            combined = "|".join(f"(?:{p.pattern})" for p in merged)
+            merged = [re.compile(combined, re.IGNORECASE)]
+        except re.error:
+            # например, глобальные флаги (?i) внутри склейки недопустимы
+            pass
+    return merged + separate
+
+
+class RulesEngine:
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.rules = {}
+        self.mentions = []
+        self._compiled = CompiledRules(self.rules, self.mentions)
+        self._mtime = None
+        # последняя ошибка загрузки, чтобы не повторять её в логе каждый опрос
+        self._load_error = None
+
+    def load(self) -> None:
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding="UTF8") as f:
+                rules = json.load(f)
+            compiled = CompiledRules(rules, self.mentions)
+        except (OSError, ValueError) as e:
+            if str(e) != self._load_error:
+                logging.error(f"Failed to load rules from {self.path}: {e}")
+                self._load_error = str(e)
+            return
+        self.rules, self._compiled, self._mtime = rules, compiled, mtime
+        self._load_error = None
+        logging.info(f"Rules loaded from {self.path}")
+
+    def set_rules(self, rules: dict) -> None:
+        self._compiled = CompiledRules(rules, self.mentions)
+        self.rules = rules
+
+    def set_mentions(self, mentions: list[str]) -> None:
+        self._compiled = CompiledRules(self.rules, mentions)
+        self.mentions = mentions
+
+    def classify(self, text: str) -> str | None:
+        """Возвращает MUTE, HIGHLIGHT или None."""
+        return self._compiled.classify(text)
+
+    async def watch(self, interval: float = 2) -> None:
+        while True:
+            self.load()
+            await asyncio.sleep(interval)
@@ -0,0 +1,109 @@
+import asyncio
+import collections
+import logging
+import time
+from enum import IntEnum
+from typing import Callable
+
+from async_timeout import timeout
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+
+
+class SendScheduler:
+    """Очередь отправки в сокет записи.
+
+    Всё, что накопилось к моменту отправки, уходит одним `write` и одним
+    `drain`. Обычные сообщения ограничены token bucket (`rate` сообщений
+    в секунду, не больше `burst` подряд), сообщения с `Priority.HIGH`
+    (keepalive) идут вне лимита и вперёд обычных.
+
+    Очередь живёт дольше соединения: после переподключения `run` вызывается
+    с writer нового сокета, а неотправленные сообщения остаются в очереди.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0,
+        burst: int = 1,
+        on_sent: Callable[[int], None] | None = None,
+    ):
+        if burst < 1:
+            # с burst < 1 токенов никогда не хватит на обычное сообщение
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.rate = rate
+        self.burst = burst
+        self.on_sent = on_sent
+        self._lanes = {priority: collections.deque() for priority in Priority}
+        self._wakeup = asyncio.Event()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+    def put(self, text: str, priority: Priority = Priority.NORMAL) -> None:
+        self._lanes[priority].append(text)
+        self._wakeup.set()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+
+    def _take_batch(self) -> tuple[list[str], list[str]]:
+        high = self._lanes[Priority.HIGH]
+        normal = self._lanes[Priority.NORMAL]
+        urgent = list(high)
+        high.clear()
+
+        if self.rate:
+            self._refill()
+            count = min(len(normal), int(self._tokens))
+            self._tokens -= count
+        else:
+            count = len(normal)
+        return urgent, [normal.popleft() for _ in range(count)]
+
+    def _put_back(self, messages: list[str]) -> None:
+        """Возвращает неотправленные обычные сообщения в начало очереди."""
+        self._lanes[Priority.NORMAL].extendleft(reversed(messages))
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + len(messages))
+
+    async def _wait_for_token(self) -> None:
+        delay = (1 - self._tokens) / self.rate
+        try:
+            async with timeout(delay):
+                await self._wakeup.wait()
+        except TimeoutError:
+            pass
+
+    async def run(self, writer: asyncio.StreamWriter) -> None:
+        # сообщения могли накопиться, пока не было соединения
+        if any(self._lanes.values()):
+            self._wakeup.set()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while any(self._lanes.values()):
+                urgent, normal = self._take_batch()
+                batch = urgent + normal
+                if batch:
+                    logging.debug(f"{len(batch)=}")
+                    try:
+                        writer.write("".join(batch).encode())
+                        await writer.drain()
+                    except BaseException:
+                        # соединение оборвалось или задачу отменили: keepalive
+                        # не нужен, а сообщения уйдут после переподключения
+                        self._put_back(normal)
+                        raise
+                    if self.on_sent is not None:
+                        self.on_sent(len(batch))
+                elif not self._lanes[Priority.HIGH]:
+                    # ждём новый токен или срочное сообщение
+                    await self._wait_for_token()
+                    self._wakeup.clear()
@@ -0,0 +1,22 @@
+import logging
+import time
+
+
+class StartupTimer:
+    """Отметки этапов запуска в миллисекундах от старта приложения."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.phases = {}
+
+    def mark(self, phase: str) -> None:
+        if phase in self.phases:
+            return
+        self.phases[phase] = (time.perf_counter() - self._start) * 1000
+        logging.info(f"Startup: {phase} at {self.phases[phase]:.0f}ms")
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{phase}={ms:.0f}ms"
+            for phase, ms in sorted(self.phases.items(), key=lambda item: item[1])
+        )
@@ -2,12 +2,20 @@ import argparse
 import asyncio
 import datetime
 import logging
+import multiprocessing
+import os
+import queue
+import signal
 import sys
+import time
 from contextlib import asynccontextmanager
 from typing import ContextManager
 
 import aiofiles
 
+from recording import Recorder
+from tools import LOOP_CHOICES, run_event_loop
+
 
 @asynccontextmanager
 async def open_connection(host: str, port: int) -> ContextManager:
@@ -19,11 +27,27 @@ async def open_connection(host: str, port: int) -> ContextManager:
         await writer.wait_closed()
 
 
-async def open_and_read_from_connection(host: str, port: int, file: str):
+class Metrics:
+    def __init__(self):
+        self.lines = 0
+        self.errors = 0
+
+
+async def open_and_read_from_connection(
+    host: str,
+    port: int,
+    file: str,
+    recorder: Recorder | None = None,
+    metrics: Metrics | None = None,
+):
     async with open_connection(host=host, port=port) as (reader, writer):
         async with aiofiles.open(file, mode="a", encoding="UTF8") as f:
             data = await reader.readline()
             while data:
+                if recorder is not None:
+                    recorder.write(data)
+                if metrics is not None:
+                    metrics.lines += 1
                 line = f'[{datetime.datetime.now().strftime("%d-%m-%Y %H:%M")}] {data.decode()}'
                 logging.debug(line)
                 await f.write(line)
@@ -31,17 +55,205 @@ async def open_and_read_from_connection(host: str, port: int, file: str):
 
 
 async def open_and_read_from_connection_with_retry(
-    host: str, port: int, file: str, delay: int = 5
+    host: str,
+    port: int,
+    file: str,
+    delay: int = 5,
+    recorder: Recorder | None = None,
+    metrics: Metrics | None = None,
 ):
     while True:
         try:
-            await open_and_read_from_connection(host, port, file)
+            await open_and_read_from_connection(host, port, file, recorder, metrics)
             break
         except Exception as e:
+            if metrics is not None:
+                metrics.errors += 1
             logging.error(f"Error: {e}. Retrying in {delay} seconds...")
             await asyncio.sleep(delay)
 
 
+async def report_metrics(
+    worker_id: int,
+    metrics: Metrics,
+    metrics_queue: multiprocessing.Queue,
+    interval: float,
+):
+    """Отправляет родителю прирост счётчиков с прошлого отчёта."""
+    lines = errors = 0
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            metrics_queue.put(
+                (worker_id, metrics.lines - lines, metrics.errors - errors)
+            )
+            lines, errors = metrics.lines, metrics.errors
+    finally:
+        metrics_queue.put((worker_id, metrics.lines - lines, metrics.errors - errors))
+
+
+async def cancel_when_set(
+    stop_event: multiprocessing.Event, future: asyncio.Future, poll: float = 0.2
+):
+    while not stop_event.is_set():
+        await asyncio.sleep(poll)
+    future.cancel()
+
+
+async def read_shard(
+    worker_id: int,
+    shard: list[tuple],
+    metrics_queue: multiprocessing.Queue,
+    interval: float,
+    stop_event: multiprocessing.Event,
+):
+    metrics = Metrics()
+    # после перезапуска упавшего процесса дописываем записи, а не затираем их
+    recorders = [
+        Recorder(record, append=True) if record else None for *_, record in shard
+    ]
+    reporter = asyncio.create_task(
+        report_metrics(worker_id, metrics, metrics_queue, interval)
+    )
+    readers = asyncio.gather(
+        *(
+            open_and_read_from_connection_with_retry(
+                host=host,
+                port=port,
+                file=file,
+                recorder=recorder,
+                metrics=metrics,
+            )
+            for (host, port, file, _), recorder in zip(shard, recorders)
+        )
+    )
+    stopper = asyncio.create_task(cancel_when_set(stop_event, readers))
+    try:
+        await readers
+    except asyncio.CancelledError:
+        if not stop_event.is_set():
+            raise
+    finally:
+        stopper.cancel()
+        reporter.cancel()
+        await asyncio.gather(stopper, reporter, return_exceptions=True)
+        for recorder in recorders:
+            if recorder is not None:
+                recorder.close()
+
+
+def run_worker(
+    worker_id: int,
+    shard: list[tuple],
+    metrics_queue: multiprocessing.Queue,
+    interval: float,
+    stop_event: multiprocessing.Event,
+    loop: str = "asyncio",
+):
+    # останавливает родитель через stop_event, Ctrl+C из терминала не прервёт
+    # закрытие файлов записи на середине
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_event_loop(
+        read_shard(worker_id, shard, metrics_queue, interval, stop_event), loop=loop
+    )
+
+
+def run_sharded(
+    workers: int,
+    hosts: list,
+    ports: list,
+    files: list,
+    records: list,
+    interval: float = 5,
+    loop: str = "asyncio",
+):
+    """Раскидывает хосты по процессам, перезапускает упавшие и суммирует метрики."""
+    targets = list(zip(hosts, ports, files, records))
+    shards = [targets[i::workers] for i in range(workers) if targets[i::workers]]
+    metrics_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+
+    def start_worker(worker_id: int) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(
+                worker_id,
+                shards[worker_id],
+                metrics_queue,
+                interval,
+                stop_event,
+                loop,
+            ),
+            name=f"reader-{worker_id}",
+        )
+        process.start()
+        return process
+
+    processes = {worker_id: start_worker(worker_id) for worker_id in range(len(shards))}
+    logging.info(f"Хостов: {len(targets)}, процессов: {len(processes)}")
+
+    total_lines = total_errors = 0
+    try:
+        while processes:
+            started_at = time.monotonic()
+            deadline = started_at + interval
+            lines = errors = 0
+            while (left := deadline - time.monotonic()) > 0:
+                try:
+                    _, worker_lines, worker_errors = metrics_queue.get(timeout=left)
+                except queue.Empty:
+                    break
+                lines += worker_lines
+                errors += worker_errors
+            total_lines += lines
+            total_errors += errors
+            logging.info(
+                f"Строк/с: {lines / (time.monotonic() - started_at):.1f}, "
+                f"всего строк: {total_lines}, ошибок: {total_errors}"
+            )
+
+            for worker_id, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0:
+                    del processes[worker_id]
+                    continue
+                logging.error(
+                    f"Процесс {process.name} завершился с кодом {process.exitcode}, перезапускаем"
+                )
+                processes[worker_id] = start_worker(worker_id)
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(processes.values(), stop_event)
+        while True:
+            try:
+                _, worker_lines, worker_errors = metrics_queue.get(timeout=0.1)
+            except queue.Empty:
+                break
+            total_lines += worker_lines
+            total_errors += worker_errors
+        logging.info(f"Итого строк: {total_lines}, ошибок: {total_errors}")
+
+
+def stop_workers(
+    processes, stop_event: multiprocessing.Event, timeout: float = 5
+) -> None:
+    """Просит процессы завершиться, чтобы они закрыли файлы и записи.
+
+    Кто не успел за timeout, добивается terminate().
+    """
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            logging.warning(f"Процесс {process.name} не завершился, прерываем")
+            process.terminate()
+            process.join()
+
+
 def parse_args() -> tuple:
     parser = argparse.ArgumentParser()
 
@@ -64,6 +276,22 @@ def parse_args() -> tuple:
         required=True,
         help="Список файлов куда будут писаться сообщения",
     )
+    parser.add_argument(
+        "--records",
+        nargs="+",
+        help="Список файлов для записи сырого трафика (по одному на хост)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Раскидать хосты по стольким процессам (0 - по числу ядер)",
+    )
+    parser.add_argument(
+        "--loop",
+        choices=LOOP_CHOICES,
+        default="asyncio",
+        help="Реализация event loop (без установленного uvloop используется asyncio)",
+    )
 
     args = parser.parse_args()
     if len(args.hosts) != len(args.ports) or len(args.hosts) != len(args.files):
@@ -71,36 +299,52 @@ def parse_args() -> tuple:
             "Ошибка: количество хостов, портов и токенов должно быть одинаковым."
         )
         sys.exit(1)
-    return args.hosts, args.ports, args.files
+    if args.records and len(args.records) != len(args.hosts):
+        logging.error(
+            "Ошибка: количество хостов и файлов записи должно быть одинаковым."
+        )
+        sys.exit(1)
+    records = args.records or [None] * len(args.hosts)
+    return args.hosts, args.ports, args.files, records, args.workers, args.loop
 
 
-async def main():
-    logging.basicConfig(level=logging.DEBUG)
-    hosts, ports, files = parse_args()
+async def main(hosts: list, ports: list, files: list, records: list):
+    recorders = [Recorder(record) if record else None for record in records]
     pending = []
-    for host, port, file in zip(hosts, ports, files):
+    for host, port, file, recorder in zip(hosts, ports, files, recorders):
         task = asyncio.create_task(
             open_and_read_from_connection(
                 host=host,
                 port=port,
                 file=file,
+                recorder=recorder,
             )
         )
         pending.append(task)
 
-    while pending:
-        done, pending = await asyncio.wait(pending, timeout=5)
-        logging.debug(f"Число завершившихся задач: {len(done)}")
-        logging.debug(f"Число ожидающих задач: {len(pending)}")
-        for done_task in done:
-            if done_task.exception() is None:
-                logging.debug(done_task.result())
-            else:
-                logging.error(
-                    "При выполнении запроса возникло исключение",
-                    exc_info=done_task.exception(),
-                )
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=5)
+            logging.debug(f"Число завершившихся задач: {len(done)}")
+            logging.debug(f"Число ожидающих задач: {len(pending)}")
+            for done_task in done:
+                if done_task.exception() is None:
+                    logging.debug(done_task.result())
+                else:
+                    logging.error(
+                        "При выполнении запроса возникло исключение",
+                        exc_info=done_task.exception(),
+                    )
+    finally:
+        for recorder in recorders:
+            if recorder is not None:
+                recorder.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(level=logging.DEBUG)
+    hosts, ports, files, records, workers, loop = parse_args()
+    if workers is None:
+        run_event_loop(main(hosts, ports, files, records), loop=loop)
+    else:
+        run_sharded(workers or os.cpu_count(), hosts, ports, files, records, loop=loop)
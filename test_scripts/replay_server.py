@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import logging
+
+from recording import start_replay_server
+
+
+def parse_args() -> tuple:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        required=True,
+        help="Файл записи трафика",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Хост",
+    )
+    parser.add_argument(
+        "--port",
+        required=True,
+        type=int,
+        help="Порт",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="Скорость воспроизведения: 1 - как в записи, N - в N раз быстрее, 0 - без пауз",
+    )
+
+    args = parser.parse_args()
+    return args.file, args.host, args.port, args.speed
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+    file, host, port, speed = parse_args()
+    server = await start_replay_server(file, host, port, speed)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,6 +6,8 @@ import sys
 from contextlib import asynccontextmanager
 from typing import ContextManager
 
+from tools import LOOP_CHOICES, run_event_loop
+
 
 @asynccontextmanager
 async def open_connection(host: str, port: int) -> ContextManager:
@@ -112,6 +114,12 @@ def parse_args() -> tuple:
         type=str,
         help="Сообщения бля отправки",
     )
+    parser.add_argument(
+        "--loop",
+        choices=LOOP_CHOICES,
+        default="asyncio",
+        help="Реализация event loop (без установленного uvloop используется asyncio)",
+    )
 
     args = parser.parse_args()
     if not args.token and not args.nickname:
@@ -123,12 +131,13 @@ def parse_args() -> tuple:
         args.token,
         args.nickname,
         args.messages,
+        args.loop,
     )
 
 
-async def main() -> None:
-    logging.basicConfig(level=logging.DEBUG)
-    host, port, token, nickname, messages = parse_args()
+async def main(
+    host: str, port: int, token: str | None, nickname: str | None, messages: list
+) -> None:
     async with open_connection(host=host, port=port) as (reader, writer):
         line: str = await read_line(reader=reader)
         logging.debug(f"{line=}")
@@ -161,4 +170,6 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(level=logging.DEBUG)
+    host, port, token, nickname, messages, loop = parse_args()
+    run_event_loop(main(host, port, token, nickname, messages), loop=loop)
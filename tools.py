@@ -1,6 +1,9 @@
 import asyncio
+import logging
 from contextlib import asynccontextmanager
-from typing import ContextManager
+from typing import ContextManager, Coroutine
+
+LOOP_CHOICES = ("asyncio", "uvloop")
 
 
 @asynccontextmanager
@@ -18,3 +21,16 @@ async def read_line(
 ) -> str:
     data = await reader.readline()
     return data.decode().strip()
+
+
+def run_event_loop(main: Coroutine, loop: str = "asyncio"):
+    """asyncio.run с выбором реализации event loop. Без uvloop работает на asyncio."""
+    if loop == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            logging.warning("uvloop is not installed, falling back to asyncio")
+        else:
+            with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                return runner.run(main)
+    return asyncio.run(main)